@@ -19,7 +19,6 @@ st_args.channels = [0]
 metadata = uhd.types.RXMetadata()
 streamer = usrp.get_rx_stream(st_args)
 bf_sz= 10000000
-recv_buffer = np.zeros((1, bf_sz), dtype=np.complex64)
 # recv_buffer_max = streamer.get_max_num_samps()
 
 # Start Stream
@@ -28,10 +27,10 @@ stream_cmd.stream_now = True
 streamer.issue_stream_cmd(stream_cmd)
 
 # Receive Samples
-samples = np.zeros(num_samps, dtype=np.complex64)
+# Receive straight into slices of samples (no intermediate buffer, no zero-fill)
+samples = np.empty(num_samps, dtype=np.complex64)
 for i in range(num_samps//bf_sz):
-    streamer.recv(recv_buffer, metadata)
-    samples[i*bf_sz:(i+1)*bf_sz] = recv_buffer[0]
+    streamer.recv(samples[i*bf_sz:(i+1)*bf_sz].reshape(1, bf_sz), metadata)
 
 # Stop Stream
 stream_cmd = uhd.types.StreamCMD(uhd.types.StreamMode.stop_cont)
@@ -7,16 +7,21 @@
 """Aurora RFNoC block demonstration using Python API."""
 
 import argparse
+import concurrent.futures
 import contextlib
+import fcntl
+import functools
 import os
 import sys
+import threading
 import time
 
 import numpy as np
 import uhd.rfnoc
-from rfnoc_oot_blocks import (AuroraBlockControl, channel_stop_policy)
+from rfnoc_oot_blocks import (AuroraBlockControl, channel_stop_policy, connect_many)
 from common import (
-    ThreadWithReturnValue,
+    add_default_transport_args,
+    aligned_empty,
     rx_streamer_flush,
     write_graph,
 )
@@ -27,7 +32,20 @@ CPU_NUMPY_MAPPING = {
     "sc16": np.dtype([("re", np.int16), ("im", np.int16)]),
 }
 
-BYTES_PER_SAMPLE = {"sc8": 2, "sc16": 4}
+# Chunk size used to compare the transmitted and received data.
+COMPARE_CHUNK_BYTES = 16 * 1024 * 1024
+
+# Number of samples generated at once, bounds the temporary arrays of the input generators.
+GENERATE_CHUNK_SAMPLES = 1024 * 1024
+
+# Number of full-buffer recv calls after which the RX metadata is checked for errors.
+RX_ERROR_CHECK_INTERVAL = 64
+
+# Amount of data per channel which the RX file writer collects for a single write call.
+WRITE_BATCH_BYTES = 1024 * 1024
+
+# Alignment of buffers, offsets and sizes for writing files with O_DIRECT.
+DIRECT_IO_ALIGNMENT = 4096
 
 
 def parse_args():
@@ -41,7 +59,12 @@ def parse_args():
     parser = argparse.ArgumentParser(
         formatter_class=argparse.RawTextHelpFormatter, description=description
     )
-    parser.add_argument("--args", metavar="arg", default="", help="Device address args")
+    parser.add_argument(
+        "--args",
+        metavar="arg",
+        default="",
+        help="Device address args. recv_buff_size and send_buff_size default to 32 MiB if not set.",
+    )
     parser.add_argument(
         "-c",
         "--aurora-channels",
@@ -80,7 +103,19 @@ def parse_args():
         "--buffer-size",
         default=10000,
         type=int,
-        help="buffer size for single transmit/receive call",
+        help="buffer size for single transmit/receive call (rounded up to a multiple of 4096 bytes with --o-direct)",
+    )
+    parser.add_argument(
+        "--rx-pool-depth",
+        default=8,
+        type=int,
+        help="Number of RX buffers used in rotation, so that writing the received data to the output files overlaps with receiving (minimum: 2, default: 8). Increase in case of overflows caused by slow storage.",
+    )
+    parser.add_argument(
+        "--o-direct",
+        default=False,
+        action="store_true",
+        help="Write the output files with O_DIRECT, bypassing the page cache. This reduces the memory bandwidth needed for writing the received data at high rates (Linux only).",
     )
     parser.add_argument(
         "--aurora-block",
@@ -113,184 +148,502 @@ def parse_args():
         help="The output file(s) to write the received data. The file is used to verify data integrity. If multiple channels are used but only one input file is given, the channel number will be appended.",
     )
     args = parser.parse_args()
+    if args.o_direct:
+        # The rows of the RX buffers are written directly, so they must be aligned
+        samples_per_block = DIRECT_IO_ALIGNMENT // CPU_NUMPY_MAPPING[args.stream_type].itemsize
+        args.buffer_size = -(-args.buffer_size // samples_per_block) * samples_per_block
     return args
 
 
 def wait_for_link_up(aurora_block, timeout=3.0):
     """Wait for the Aurora block to report link up."""
-    start_time = time.time()
-    dt = 0
-    while dt < timeout:
-        if aurora_block.get_link_status() is True:
-            return True, dt
-        time.sleep(0.1)
-        dt = time.time() - start_time
+    start_time = time.monotonic()
+    if aurora_block.wait_for_link_up(timeout):
+        return True, time.monotonic() - start_time
     return False, timeout
 
 
-def connect_blocks(graph, connections, is_back_edge=False):
+def connect_blocks(graph, chains, is_back_edge=False):
     """Connect RFNoC Blocks.
 
+    The edges of all chains are passed to the graph in a single call.
+
     Args:
         graph: the RFNoC graph
-        connections: array of tuples (block, port) where the connection is established
-            from the first to the second entry, then from the second to the third
-            and so on
+        chains: list of connection chains. Every chain is an array of tuples (block, port)
+            where the connection is established from the first to the second entry, then
+            from the second to the third and so on
         is_back_edge: Set this flag to true if the graph is a circular graph
     """
-    src = connections[:-1]  # elements 0..N-1
-    dst = connections[1:]  # elements 1..N
-    for (src_blk, src_port), (dst_blk, dst_port) in zip(src, dst):
-        graph.connect(src_blk, src_port, dst_blk, dst_port, is_back_edge)
+    edges = []
+    for connections in chains:
+        src = connections[:-1]  # elements 0..N-1
+        dst = connections[1:]  # elements 1..N
+        for (src_blk, src_port), (dst_blk, dst_port) in zip(src, dst):
+            edges.append((src_blk, src_port, dst_blk, dst_port, is_back_edge))
+    connect_many(graph, edges)
+
+
+def run_event_loop(tasks):
+    """Run the given generators (tasks) in turns until all of them are finished.
+
+    Every task performs one non-blocking step per turn and yields whether it made
+    progress. If no task made progress in a round, the GIL is released briefly so that
+    other threads (e.g., the RX file writer) can run.
+
+    Returns:
+        A list with the return value of each task.
+    """
+    results = [None] * len(tasks)
+    pending = list(enumerate(tasks))
+    while pending:
+        progress = False
+        for entry in list(pending):
+            idx, task = entry
+            try:
+                progress |= next(task)
+            except StopIteration as stop:
+                results[idx] = stop.value
+                pending.remove(entry)
+        if not progress:
+            time.sleep(0)
+    return results
+
+
+def tx_function(tx_streamer, tx_buffer, tx_md, sources, iterations=1):
+    """The transmit function which streams data from the host to the USRP.
+
+    The data is taken from the memory-mapped input files given by sources (one per
+    channel). For a single channel, slices of the memory map are sent directly.
+    Otherwise, the data of all channels is copied into tx_buffer before sending.
+
+    Returns a task for run_event_loop(), every step calls send() without timeout.
+    The task returns the number of transmitted samples.
+    """
+    if tx_buffer.shape[0] == 1:
+        return _tx_single_channel(tx_streamer, tx_md, sources[0], tx_buffer.shape[1], iterations)
+    return _tx_multi_channel(tx_streamer, tx_buffer, tx_md, sources, iterations)
 
 
-def tx_function(tx_streamer, tx_buffer, tx_md, timeout, files, iterations=1):
-    """The transmit function which streams data from the host to the USRP."""
+def _tx_multi_channel(tx_streamer, tx_buffer, tx_md, sources, iterations):
+    """The transmit function for multiple channels, see tx_function()."""
     num_chans = tx_buffer.shape[0]
     buffer_size = tx_buffer.shape[1]
+    num_samples = len(sources[0])
+    # Create the views for all chunks once, they are reused in every iteration. Each
+    # chunk consists of the buffer to send and the (destination, source) pairs to copy
+    # into that buffer beforehand.
+    chunks = []
+    for offset in range(0, num_samples, buffer_size):
+        buffer_len = min(buffer_size, num_samples - offset)
+        buffer = tx_buffer[:, :buffer_len]
+        copies = [
+            (buffer[idx], sources[idx][offset : offset + buffer_len]) for idx in range(num_chans)
+        ]
+        chunks.append((buffer, buffer_len, copies))
+    send = tx_streamer.send
     num_tx = 0
-    iteration = 0
-    while iteration < iterations:
-        num_tx_iteration = 0
-        # print(f"iteration {iteration}")
-        for idx in range(num_chans):
-            files[idx].seek(0)
-        while True:
-            for idx in range(num_chans):
-                buffer = np.fromfile(files[idx], count=buffer_size, dtype=tx_buffer.dtype)
-                if idx == 0:
-                    buffer_len_current = len(buffer)
-                else:
-                    assert len(buffer) == buffer_len_current
-                tx_buffer[idx, :buffer_len_current] = buffer
-            if buffer_len_current == 0:
-                iteration += 1
-                break
-            num_tx_current = 0
-            while num_tx_current < buffer_len_current:
-                transmitted = tx_streamer.send(
-                    tx_buffer[:, num_tx_current:buffer_len_current], tx_md, timeout
-                )
-                num_tx_current += transmitted
-                num_tx_iteration += transmitted
-                num_tx += transmitted
-            # print(f" TX {num_tx}")
+    for _ in range(iterations):
+        for buffer, buffer_len, copies in chunks:
+            for destination, source in copies:
+                # Same dtype on both sides: a plain contiguous memory copy
+                np.copyto(destination, source, casting="no")
+            transmitted = send(buffer, tx_md, 0)
+            yield transmitted > 0
+            # Only if the streamer could not take all samples, the remainder needs a new view
+            while transmitted < buffer_len:
+                sent = send(buffer[:, transmitted:], tx_md, 0)
+                transmitted += sent
+                yield sent > 0
+            num_tx += transmitted
     return num_tx
 
 
-def rx_function(rx_streamer, rx_buffer, rx_md, timeout, files, num_samples):
-    """The receive function which streams data from the USRP to the host."""
-    num_chans = rx_buffer.shape[0]
-    num_rx = 0
-    reported_overflow = False
-    while num_rx < num_samples:
-        received = rx_streamer.recv(rx_buffer, rx_md, timeout)
-        num_rx += received
-        # print(f" RX {num_rx}")
-        for idx in range(num_chans):
-            rx_buffer[idx, :received].tofile(files[idx])
-        if rx_md.error_code == uhd.types.RXMetadataErrorCode.timeout:
-            print("RX timeout")
-            return num_rx
-        if rx_md.error_code == uhd.types.RXMetadataErrorCode.overflow:
-            if not reported_overflow:
-                error_name = "out-of-sequence" if rx_md.out_of_sequence else rx_md.error_code.name
-                print(f"Got an {error_name} indication.")
-                reported_overflow = True
-        if rx_md.error_code != uhd.types.RXMetadataErrorCode.none:
-            print(f"Got an error indication: {rx_md.strerror()}")
-            return num_rx
-    return num_rx
-
+def _tx_single_channel(tx_streamer, tx_md, source, buffer_size, iterations):
+    """The transmit function for a single channel, see tx_function().
 
-def compare(reference_file, received_file, num_samples_total, num_iterations, buffer_size, dtype):
-    """Compare the content of two files."""
-    processed_samples = 0
-    iteration = 0
-    while processed_samples < num_samples_total:
-        reference = np.fromfile(reference_file, count=buffer_size, dtype=dtype)
-        if len(reference) == 0:
-            if iteration < num_iterations:
-                reference_file.seek(0)
-                iteration += 1
-                continue
-            raise EOFError(
-                f"Reference file {reference_file.name} reached EOF early, iteration {iteration}, number of processed samples: {processed_samples}"
-            )
-        received = np.fromfile(received_file, count=buffer_size, dtype=dtype)
-        if len(received) == 0:
-            raise EOFError(
-                f"Received file {received_file.name} reached EOF early, number of processed samples {processed_samples}"
-            )
-        assert np.array_equal(
-            reference, received
-        ), f"array mismatch - number of processed samples: {processed_samples}, reference data: {reference}, received data: {received}"
-        processed_samples += len(reference)
+    The slices of the memory-mapped input file are sent directly, without copying. This
+    requires a writeable mapping, send() copies read-only arrays.
+    """
+    chunks = [
+        source[offset : offset + buffer_size].reshape(1, -1)
+        for offset in range(0, len(source), buffer_size)
+    ]
+    send = tx_streamer.send
+    num_tx = 0
+    for _ in range(iterations):
+        for chunk in chunks:
+            transmitted = send(chunk, tx_md, 0)
+            yield transmitted > 0
+            while transmitted < chunk.shape[1]:
+                sent = send(chunk[:, transmitted:], tx_md, 0)
+                transmitted += sent
+                yield sent > 0
+            num_tx += transmitted
+    return num_tx
 
 
-class ComplexCounterIter:
-    """This class provides an iterator which returns a complex number with counter values.
+class RxFileWriter:
+    """Writes the received samples of all channels to the output files on a writer thread.
 
-    The real part contains an increasing counter value.
-    The imaginary part contains a decreasing counter value.
+    Args:
+        filenames: the output file names, one per channel
+        depth: the number of receive buffers in the pool, at most depth - 1 are pending
+        buffer_size: the number of samples per channel of each buffer, a multiple of
+            DIRECT_IO_ALIGNMENT bytes with direct=True
+        dtype: the data type of the samples
+        direct: open the output files with O_DIRECT to bypass the page cache
     """
 
-    def __init__(self, dtype):
-        """Initialize an object of this class."""
-        self.dtype = dtype
-        if str(dtype[0]) == "int8":
-            self.real_dtype = np.int8
-        elif str(dtype[0]) == "int16":
-            self.real_dtype = np.int16
+    def __init__(self, filenames, depth, buffer_size, dtype, direct=False):
+        """Initialize an object of this class, opens (and truncates) the output files."""
+        assert depth > 1, "The RX buffer pool must contain at least 2 buffers"
+        dtype = np.dtype(dtype)
+        if direct:
+            assert (
+                buffer_size * dtype.itemsize % DIRECT_IO_ALIGNMENT == 0
+            ), "The RX buffer rows must be a multiple of DIRECT_IO_ALIGNMENT with O_DIRECT"
+        flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC
+        if direct:
+            flags |= os.O_DIRECT
+        self.fds = []
+        for filename in filenames:
+            self.fds.append(os.open(filename, flags, 0o644))
+        self.offsets = [0] * len(self.fds)
+        # With O_DIRECT, every buffer has room to be shifted by up to one aligned block
+        num_values = len(self.fds) * buffer_size
+        self._block_samples = DIRECT_IO_ALIGNMENT // dtype.itemsize if direct else 0
+        self._pool = [aligned_empty(num_values + self._block_samples, dtype) for _ in range(depth)]
+        self._pool_bytes = [memoryview(values).cast("B") for values in self._pool]
+        # The (shift, buffer) returned by get_buffer() for each slot of the pool
+        self._buffers = [
+            (0, values[:num_values].reshape(len(self.fds), buffer_size)) for values in self._pool
+        ]
+        self._shift = 0  # Shift of the next buffer, only modified by submit()
+        if direct:
+            self._staging = [
+                memoryview(aligned_empty(DIRECT_IO_ALIGNMENT, np.uint8, DIRECT_IO_ALIGNMENT))
+                for _ in self.fds
+            ]
+            self._staging_fill = [0] * len(self.fds)
         else:
-            raise NotImplementedError()
-
-    def __iter__(self):
-        """Initialize the iterator."""
-        self.real = self.real_dtype(0)
-        self.imag = self.real_dtype(-1)
+            self._staging = None
+        self._error = None
+        self._slots = [None] * depth
+        self._head = 0  # Number of buffers written, only modified by the writer thread
+        self._tail = 0  # Number of buffers submitted, only modified by submit()
+        self._closing = False
+        self._data_available = threading.Event()
+        self._slot_available = threading.Event()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.start()
+
+    def __enter__(self):
+        """Enter the runtime context."""
         return self
 
-    def __next__(self):
-        """Iterator: Generate and return the next value."""
-        current_real = self.real
-        current_imag = self.imag
-        self.real += 1
-        self.imag -= 1
-        return (current_real, current_imag)
+    def __exit__(self, *exc_info):
+        """Exit the runtime context, write all pending buffers and close the output files."""
+        self.close()
+
+    def get_buffer(self):
+        """Return the buffer to receive the next samples into, one row per channel.
+
+        The buffer is C-contiguous, as required by recv(). The same buffer is returned
+        until it is passed to submit(). With O_DIRECT, the buffer is shifted by the size of
+        the unaligned remainder of the previous buffers, see _write_direct().
+        """
+        slot = self._tail % len(self._slots)
+        shift, buffer = self._buffers[slot]
+        if shift != self._shift:
+            num_chans, buffer_size = buffer.shape
+            values = self._pool[slot][self._shift : self._shift + num_chans * buffer_size]
+            buffer = values.reshape(num_chans, buffer_size)
+            self._buffers[slot] = (self._shift, buffer)
+        return buffer
+
+    def submit(self, buffer, num_samples):
+        """Queue the first num_samples samples of each channel (row) in buffer for writing.
+
+        The buffer must be the one returned by get_buffer(). The buffers are passed to
+        the writer thread through a single-producer/single-consumer ring of slots: submit()
+        fills the slot at the tail and advances the tail, the writer thread advances the
+        head after writing. Both counters are only modified by one thread each, so no lock
+        is taken per buffer. Blocks while depth - 1 buffers are pending.
+        """
+        if num_samples == 0:
+            return
+        depth = len(self._slots)
+        while self._tail - self._head >= depth - 1:
+            # Clear before checking again, so a wake-up in between is not missed
+            self._slot_available.clear()
+            if self._tail - self._head >= depth - 1:
+                self._slot_available.wait()
+        slot = self._tail % depth
+        self._slots[slot] = (buffer, num_samples, self._pool_bytes[slot])
+        if self._block_samples:
+            self._shift = (self._shift + num_samples) % self._block_samples
+        self._tail += 1
+        self._data_available.set()
+
+    def _write(self, batch):
+        """Write the samples of all (buffer, num_samples, pool_bytes) items in batch."""
+        for idx in range(len(self.fds)):
+            if self._staging is None:
+                views = [
+                    memoryview(buffer[idx, :num_samples]).cast("B")
+                    for buffer, num_samples, _ in batch
+                ]
+                self._pwritev(idx, views)
+            else:
+                self._write_direct(idx, batch)
+
+    def _write_direct(self, idx, batch):
+        """Write the samples of channel idx in batch to its file (O_DIRECT mode).
+
+        O_DIRECT requires aligned buffers, offsets and sizes. Each buffer is shifted by the size of the remainder which is left in the staging
+        buffer, so the remainder is copied in front of the row and the row is written
+        directly from the pool up to its last whole multiple of DIRECT_IO_ALIGNMENT. The
+        space in front of a row is the end of the previous row, which was already written.
+        Only the new remainder is copied into the staging buffer, it is written without
+        O_DIRECT on close().
+        """
+        staging = self._staging[idx]
+        fill = self._staging_fill[idx]
+        views = []
+        for buffer, num_samples, pool_bytes in batch:
+            start = idx * buffer.shape[1] * buffer.itemsize
+            row = pool_bytes[start : start + fill + num_samples * buffer.itemsize]
+            row[:fill] = staging[:fill]
+            aligned = len(row) - len(row) % DIRECT_IO_ALIGNMENT
+            if aligned > 0:
+                views.append(row[:aligned])
+            fill = len(row) - aligned
+            staging[:fill] = row[aligned:]
+        self._staging_fill[idx] = fill
+        self._pwritev(idx, views)
+
+    def _pwritev(self, idx, views):
+        """Write the views to file idx at its current offset."""
+        fd = self.fds[idx]
+        remaining = sum(len(view) for view in views)
+        while remaining > 0:
+            written = os.pwritev(fd, views, self.offsets[idx])
+            self.offsets[idx] += written
+            remaining -= written
+            # Skip the data which was written in case of a partial write
+            while views and written >= len(views[0]):
+                written -= len(views.pop(0))
+            if written > 0:
+                views[0] = views[0][written:]
+
+    def _run(self):
+        """Writer thread: write the submitted buffers until the writer is closed.
+
+        The buffers which are queued at the same time are written with a single
+        os.pwritev() call per channel. The events only wake up a side which waits for data
+        (writer) or for free slots (receiver).
+        """
+        max_batch_len = os.sysconf("SC_IOV_MAX")
+        depth = len(self._slots)
+        while True:
+            if self._head == self._tail:
+                if self._closing:
+                    break
+                # Clear before checking again, so a wake-up in between is not missed
+                self._data_available.clear()
+                if self._head == self._tail and not self._closing:
+                    self._data_available.wait()
+                continue
+            # Take all buffers which are waiting, up to WRITE_BATCH_BYTES per channel
+            batch = []
+            batch_bytes = 0
+            tail = self._tail
+            while self._head + len(batch) < tail:
+                if batch_bytes >= WRITE_BATCH_BYTES or len(batch) >= max_batch_len:
+                    break
+                buffer, num_samples, pool_bytes = self._slots[(self._head + len(batch)) % depth]
+                batch.append((buffer, num_samples, pool_bytes))
+                batch_bytes += buffer.itemsize * num_samples
+            # After an error, keep releasing the buffers so that submit() never blocks
+            if self._error is None:
+                try:
+                    self._write(batch)
+                except OSError as error:
+                    self._error = error
+            self._head += len(batch)
+            self._slot_available.set()
+
+    def close(self):
+        """Write all pending buffers and close the output files."""
+        if self._thread.is_alive():
+            self._closing = True
+            self._data_available.set()
+            self._thread.join()
+        try:
+            if self._staging is not None and self._error is None:
+                for idx, fd in enumerate(self.fds):
+                    if self._staging_fill[idx] > 0:
+                        # The remainder is not aligned, write it without O_DIRECT
+                        flags = fcntl.fcntl(fd, fcntl.F_GETFL)
+                        fcntl.fcntl(fd, fcntl.F_SETFL, flags & ~os.O_DIRECT)
+                        self._pwritev(idx, [self._staging[idx][: self._staging_fill[idx]]])
+                        self._staging_fill[idx] = 0
+        finally:
+            for fd in self.fds:
+                os.close(fd)
+            self.fds = []
+        if self._error is not None:
+            raise self._error
+
+
+def rx_function(rx_streamer, rx_md, timeout, writer, num_samples):
+    """The receive function which streams data from the USRP to the host.
+
+    The data is received into the buffers of the writer's pool in rotation and handed
+    over to the writer, so writing the data to the files does not delay the next recv call.
+
+    This is a task for run_event_loop(): every step calls recv() without timeout.
+    Receiving stops with an RX timeout if no data arrived for timeout seconds.
+    Returns the number of received samples.
+    """
+    # Resolve everything used in the loop up front: the bound methods and enum values
+    # are otherwise looked up again (through the pybind11 bindings) for every recv.
+    # The error codes are compared as plain integers, not through the enum wrapper.
+    recv = rx_streamer.recv
+    get_buffer = writer.get_buffer
+    submit = writer.submit
+    error_none = int(uhd.types.RXMetadataErrorCode.none)
+    error_timeout = int(uhd.types.RXMetadataErrorCode.timeout)
+    error_overflow = int(uhd.types.RXMetadataErrorCode.overflow)
+    buffer_size = get_buffer().shape[1]
+    num_rx = 0
+    reported_overflow = False
+    check_countdown = RX_ERROR_CHECK_INTERVAL
+    idle_since = None
+    while num_rx < num_samples:
+        rx_buffer = get_buffer()
+        received = recv(rx_buffer, rx_md, 0)
+        if received > 0:
+            num_rx += received
+            submit(rx_buffer, received)
+            idle_since = None
+        # Errors end a recv call early, so the metadata only needs to be inspected
+        # after short reads. Full reads are still checked every few iterations.
+        check_countdown -= 1
+        if received < buffer_size or check_countdown == 0:
+            check_countdown = RX_ERROR_CHECK_INTERVAL
+            error_code = int(rx_md.error_code)
+            if error_code == error_timeout:
+                # No data available yet, this is only an error if it persists
+                now = time.monotonic()
+                if idle_since is None:
+                    idle_since = now
+                elif now - idle_since >= timeout:
+                    print("RX timeout")
+                    return num_rx
+            elif error_code != error_none:
+                # Slow path: only now the metadata is converted to strings
+                if error_code == error_overflow and not reported_overflow:
+                    if rx_md.out_of_sequence:
+                        error_name = "out-of-sequence"
+                    else:
+                        error_name = rx_md.error_code.name
+                    print(f"Got an {error_name} indication.")
+                    reported_overflow = True
+                print(f"Got an error indication: {rx_md.strerror()}")
+                return num_rx
+        yield received > 0
+    return num_rx
+
 
+def compare(reference_filename, received_filename, num_samples_total, num_iterations, dtype):
+    """Compare the content of two files.
+
+    The first num_samples_total samples of the received file are compared against the
+    reference file, which is repeated num_iterations times. Both files are memory-mapped
+    and compared in chunks of COMPARE_CHUNK_BYTES. The samples are compared as raw
+    unsigned integers of the sample size, dtype is only used to report mismatches.
+    """
+    if num_samples_total == 0:
+        return
+    raw_dtype = np.dtype(f"u{dtype.itemsize}")
+    reference = np.memmap(reference_filename, dtype=raw_dtype, mode="r")
+    received = np.memmap(received_filename, dtype=raw_dtype, mode="r")
+    if len(reference) * num_iterations < num_samples_total:
+        raise EOFError(
+            f"Reference file {reference_filename} is too short, {num_iterations} iteration(s) of {len(reference)} samples do not cover {num_samples_total} samples"
+        )
+    if len(received) < num_samples_total:
+        raise EOFError(
+            f"Received file {received_filename} is too short, {len(received)} samples available, {num_samples_total} samples expected"
+        )
+    chunk_size = COMPARE_CHUNK_BYTES // dtype.itemsize
+    processed_samples = 0
+    while processed_samples < num_samples_total:
+        reference_offset = processed_samples % len(reference)
+        count = min(
+            chunk_size, len(reference) - reference_offset, num_samples_total - processed_samples
+        )
+        reference_chunk = reference[reference_offset : reference_offset + count]
+        received_chunk = received[processed_samples : processed_samples + count]
+        if not np.array_equal(reference_chunk, received_chunk):
+            mismatch = np.flatnonzero(reference_chunk != received_chunk)[0]
+            reference_sample = reference_chunk[mismatch : mismatch + 1].view(dtype)[0]
+            received_sample = received_chunk[mismatch : mismatch + 1].view(dtype)[0]
+            raise AssertionError(
+                f"array mismatch - sample index: {processed_samples + mismatch}, reference data: {reference_sample}, received data: {received_sample}"
+            )
+        processed_samples += count
 
-class ComplexRandomIter:
-    """This class provides in iterator which returns a random complex number."""
 
-    def __init__(self, dtype):
-        """Initialize an object of this class."""
-        self.complex_dtype = dtype
-        self.real_dtype = dtype[0]
-        self.min = np.iinfo(self.real_dtype).min
-        self.max = np.iinfo(self.real_dtype).max
+def generate_counter(num_samples, dtype, out=None):
+    """Generate complex samples with counter values.
 
-    def __iter__(self):
-        """Intitialize the iterator."""
-        self.rng = np.random.default_rng()
-        return self
+    The real part contains an increasing counter value starting at 0.
+    The imaginary part contains a decreasing counter value starting at -1.
+    Both counters wrap around according to the integer type of dtype.
+    The samples are written to out if given, otherwise a new array is returned.
+    """
+    samples = np.empty(num_samples, dtype=dtype) if out is None else out
+    for start in range(0, num_samples, GENERATE_CHUNK_SAMPLES):
+        counter = np.arange(start, min(start + GENERATE_CHUNK_SAMPLES, num_samples))
+        chunk = samples[start : start + len(counter)]
+        np.copyto(chunk["re"], counter, casting="unsafe")
+        np.subtract(-1, counter, out=counter)
+        np.copyto(chunk["im"], counter, casting="unsafe")
+    return samples
 
-    def __next__(self):
-        """Create and return the next value."""
-        real = self.rng.integers(self.min, self.max, dtype=self.real_dtype)
-        imag = self.rng.integers(self.min, self.max, dtype=self.real_dtype)
-        return (real, imag)
 
+def generate_random(num_samples, dtype, out=None):
+    """Generate complex samples with random values.
 
+    The samples are written to out if given, otherwise a new array is returned.
+    """
+    rng = np.random.default_rng()
+    real_dtype = dtype["re"]
+    int_info = np.iinfo(real_dtype)
+    samples = np.empty(num_samples, dtype=dtype) if out is None else out
+    for start in range(0, num_samples, GENERATE_CHUNK_SAMPLES):
+        chunk = samples[start : start + GENERATE_CHUNK_SAMPLES]
+        chunk["re"] = rng.integers(int_info.min, int_info.max, size=len(chunk), dtype=real_dtype)
+        chunk["im"] = rng.integers(int_info.min, int_info.max, size=len(chunk), dtype=real_dtype)
+    return samples
+
+
+@functools.lru_cache(maxsize=None)
 def get_filenames(filenames, channels, pattern="{}-chan{}{}"):
-    """Get the filenames. Append the channel number in case of multiple channels."""
+    """Get the filenames. Append the channel number in case of multiple channels.
+
+    The arguments must be hashable (tuples), the result is cached.
+    """
     num_files_given = len(filenames)
     num_channels = len(channels)
     if num_files_given == num_channels:
         return filenames
     elif num_files_given == 1:
         basename, ext = os.path.splitext(filenames[0])
-        return [pattern.format(basename, chan, ext) for chan in channels]
+        return tuple(pattern.format(basename, chan, ext) for chan in channels)
     else:
         raise ValueError(f"Cannot map {num_files_given} files to {num_channels} channels")
 
@@ -301,7 +654,7 @@ def main():
     args = parse_args()
     num_chans = len(args.aurora_channels)
 
-    graph = uhd.rfnoc.RfnocGraph(args.args)
+    graph = uhd.rfnoc.RfnocGraph(add_default_transport_args(args.args))
 
     connections = [[] for x in range(num_chans)]
 
@@ -345,9 +698,9 @@ def main():
         # ... add connection
         connections[idx].append((rx_streamer, idx))
 
-    for idx, connection in enumerate(connections):
-        print(f"connecting blocks for channel {args.aurora_channels[idx]} (idx={idx})")
-        connect_blocks(graph, connection)
+    for idx, chan in enumerate(args.aurora_channels):
+        print(f"connecting blocks for channel {chan} (idx={idx})")
+    connect_blocks(graph, connections)
     graph.commit()
 
     # Write a graphical representation of the graph if the argument "graph" was provided
@@ -357,8 +710,8 @@ def main():
 
     rx_streamer_flush(rx_streamer)
 
-    in_filenames = get_filenames(args.input, args.aurora_channels)
-    out_filenames = get_filenames(args.output, args.aurora_channels)
+    in_filenames = get_filenames(tuple(args.input), tuple(args.aurora_channels))
+    out_filenames = get_filenames(tuple(args.output), tuple(args.aurora_channels))
 
     if args.generate_input is not None:
         num_samples = 1000000
@@ -369,22 +722,31 @@ def main():
             print(
                 f"Creating file {in_filenames[idx]} (mode: {args.generate_input}, num_samples: {num_samples}, dtype: ({dtype_str}))"
             )
-            with open(in_filenames[idx], "wb") as in_file:
-                iter_mapping = {"counter": ComplexCounterIter, "random": ComplexRandomIter}
-                iter0 = iter_mapping[args.generate_input](CPU_NUMPY_MAPPING[args.stream_type])
-                in_file.write(
-                    np.fromiter(iter0, dtype=CPU_NUMPY_MAPPING[args.stream_type], count=num_samples)
-                )
+            # Size the file up front and fill it in place through a memory map
+            in_map = np.memmap(in_filenames[idx], dtype=dtype, mode="w+", shape=(num_samples,))
+            generator_mapping = {"counter": generate_counter, "random": generate_random}
+            generator_mapping[args.generate_input](num_samples, dtype, out=in_map)
+            in_map.flush()
+            del in_map
 
     with contextlib.ExitStack() as stack:
-        in_files = []
-        out_files = []
+        in_maps = []
+        rx_writer = stack.enter_context(
+            RxFileWriter(
+                out_filenames,
+                args.rx_pool_depth,
+                args.buffer_size,
+                CPU_NUMPY_MAPPING[args.stream_type],
+                direct=args.o_direct,
+            )
+        )
         for idx in range(num_chans):
-            in_files.append(stack.enter_context(open(in_filenames[idx], "rb")))
-            out_files.append(stack.enter_context(open(out_filenames[idx], "wb")))
-            num_samples_idx = (
-                os.stat(in_files[0].name).st_size // BYTES_PER_SAMPLE[args.stream_type]
+            # send() requires writeable arrays and copies read-only ones. A copy-on-write
+            # mapping is writeable without ever modifying the input file.
+            in_maps.append(
+                np.memmap(in_filenames[idx], dtype=CPU_NUMPY_MAPPING[args.stream_type], mode="c")
             )
+            num_samples_idx = len(in_maps[idx])
             if idx == 0:
                 num_samples = num_samples_idx
             else:
@@ -392,30 +754,20 @@ def main():
                     num_samples == num_samples_idx
                 ), f"file {in_filenames[idx]} has different size than {in_filenames[0]}"
 
-        # Setup thread for TX streamer
-        tx_buffer = np.zeros(
+        # Setup TX streaming task
+        tx_buffer = aligned_empty(
             (num_chans, args.buffer_size), dtype=CPU_NUMPY_MAPPING[args.stream_type]
         )
         tx_md = uhd.types.TXMetadata()
-        tx_thread = ThreadWithReturnValue(
-            target=tx_function, args=(tx_streamer, tx_buffer, tx_md, 0.1, in_files, args.iterations)
-        )
+        tx_task = tx_function(tx_streamer, tx_buffer, tx_md, in_maps, args.iterations)
 
-        # Setup thread for RX streamer
-        rx_buffer = np.zeros(
-            (num_chans, args.buffer_size), dtype=CPU_NUMPY_MAPPING[args.stream_type]
-        )
+        # Setup RX streaming task
         rx_md = uhd.types.RXMetadata()
-        rx_thread = ThreadWithReturnValue(
-            target=rx_function,
-            args=(rx_streamer, rx_buffer, rx_md, 0.1, out_files, num_samples * args.iterations),
-        )
+        rx_task = rx_function(rx_streamer, rx_md, 0.1, rx_writer, num_samples * args.iterations)
 
+        # TX and RX are run alternately in this thread, no thread synchronization needed
         print("\nStarting streaming")
-        rx_thread.start()
-        tx_thread.start()
-        num_tx = tx_thread.join()
-        num_rx = rx_thread.join()
+        num_rx, num_tx = run_event_loop([rx_task, tx_task])
         print("Stopped streaming")
         assert num_tx is not None
         assert num_rx is not None
@@ -444,21 +796,24 @@ def main():
         errors.append(f"Aurora block reported {aurora_crc_errors} CRC errors")
 
     # 9. Verify the data integrity of the received data
+    # ... the channels are compared in parallel, numpy releases the GIL while comparing
     print("")
-    for idx, chan in enumerate(args.aurora_channels):
-        print(f"Verify data for channel {chan}... ", end="")
-        with contextlib.ExitStack() as stack:
-            in_file = stack.enter_context(open(in_filenames[idx], "rb"))
-            out_file = stack.enter_context(open(out_filenames[idx], "rb"))
+    with concurrent.futures.ThreadPoolExecutor(max_workers=num_chans) as executor:
+        results = [
+            executor.submit(
+                compare,
+                in_filenames[idx],
+                out_filenames[idx],
+                num_rx,
+                num_iterations=args.iterations,
+                dtype=CPU_NUMPY_MAPPING[args.stream_type],
+            )
+            for idx in range(num_chans)
+        ]
+        for chan, result in zip(args.aurora_channels, results):
+            print(f"Verify data for channel {chan}... ", end="")
             try:
-                compare(
-                    in_file,
-                    out_file,
-                    num_rx,
-                    num_iterations=args.iterations,
-                    buffer_size=args.buffer_size,
-                    dtype=CPU_NUMPY_MAPPING[args.stream_type],
-                )
+                result.result()
                 print("OK")
             except AssertionError as error:
                 errors.append(str(error))
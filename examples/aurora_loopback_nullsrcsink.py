@@ -9,19 +9,37 @@
 import argparse
 import logging
 import sys
+import threading
 import time
 
 import numpy as np
 import uhd.rfnoc
-from rfnoc_oot_blocks import (AuroraBlockControl, channel_stop_policy)
+from rfnoc_oot_blocks import (AuroraBlockControl, channel_stop_policy, connect_many)
 from common import (
     NullSrcSinkReferenceData,
     ThreadWithReturnValue,
+    add_default_transport_args,
+    aligned_empty,
     rx_streamer_flush,
     write_graph,
 )
 from uhd.libpyuhd.rfnoc import LINES, PACKETS, SINK, SOURCE
 
+# Clock rate of the NullSrcSink blocks (CHDR clock) and the number of U32 words per line
+# (64 bit CHDR width). The source generates at most one line every throttle cycles + 1
+# clock cycles, which gives an upper bound for the amount of data streamed to the host.
+NULL_SRC_CLOCK_RATE_HZ = 200e6
+WORDS_PER_LINE = 2
+# Maximum number of U32 words per channel which are kept on the host for verification.
+MAX_RX_BUFFER_WORDS = 10000000
+# Number of U32 words verified at once. Verification stops at the first chunk containing a
+# mismatch, and the reference data is only generated for one chunk at a time.
+VERIFY_CHUNK_WORDS = 1024 * 1024
+# Number of U32 words per channel received by one recv() call when the data cannot be
+# received directly into the RX buffer. recv() collects the packets without holding the GIL,
+# large chunks keep the number of Python iterations low.
+RX_CHUNK_WORDS = 1024 * 1024
+
 
 def parse_args():
     """Parse the command line arguments."""
@@ -53,7 +71,12 @@ def parse_args():
     parser = argparse.ArgumentParser(
         formatter_class=argparse.RawTextHelpFormatter, description=description
     )
-    parser.add_argument("--args", metavar="arg", default="", help="Device address args")
+    parser.add_argument(
+        "--args",
+        metavar="arg",
+        default="",
+        help="Device address args. recv_buff_size and send_buff_size default to 32 MiB if not set.",
+    )
     parser.add_argument(
         "--sink",
         default="fpga",
@@ -123,16 +146,26 @@ def parse_args():
 
 def wait_for_link_up(aurora_block, timeout=3.0):
     """Wait for the Aurora block to report link up."""
-    start_time = time.time()
-    dt = 0
-    while dt < timeout:
-        if aurora_block.get_link_status() is True:
-            return True, dt
-        time.sleep(0.1)
-        dt = time.time() - start_time
+    start_time = time.monotonic()
+    if aurora_block.wait_for_link_up(timeout):
+        return True, time.monotonic() - start_time
     return False, timeout
 
 
+def configure_null_blocks(graph, block_ids, bytes_per_packet, throttle_cycles):
+    """Instantiate and configure the controllers of the given NullSrcSink blocks.
+
+    Returns the block controllers in the order of block_ids.
+    """
+    null_blocks = []
+    for block_id in block_ids:
+        null_block = uhd.rfnoc.NullBlockControl(graph.get_block(block_id))
+        null_block.set_bytes_per_packet(bytes_per_packet)
+        null_block.set_throttle_cycles(throttle_cycles)
+        null_blocks.append(null_block)
+    return null_blocks
+
+
 def generate_data(null_blocks, duration):
     """Activate streaming on null block for the given duration to generate some data."""
     for null_block in null_blocks:
@@ -142,71 +175,104 @@ def generate_data(null_blocks, duration):
         null_block.issue_stream_cmd(uhd.types.StreamCMD(uhd.types.StreamMode.stop_cont))
 
 
-def rx_streamer_flush(rx_streamer):
-    """Flush the RX streamer.
+def receive_chunks(rx_streamer, rx_data, rx_md, done):
+    """Receive data into rx_data until done is set.
 
-    Repeatedly call .recv until no data is received within the given timeout.
+    recv() requires a C-contiguous buffer and otherwise receives into a temporary copy. The
+    data is therefore received directly into the remaining part of rx_data as long as it is
+    contiguous, which is always the case with a single channel. Otherwise chunks of
+    RX_CHUNK_WORDS are received into a staging buffer and copied into rx_data. Once rx_data is
+    full, the remaining data is discarded. Returns the number of samples per channel stored in
+    rx_data and the number of samples per channel which were discarded.
     """
-    rx_md = uhd.types.RXMetadata()
-    rx_data = np.zeros((rx_streamer.get_num_channels(), 10000000), dtype=np.uint32)
-    num_rx_total = 0
-    num_rx = None
-    while num_rx != 0:
-        num_rx = rx_streamer.recv(rx_data, rx_md, 0.1)
-        num_rx_total += num_rx
-    if num_rx_total > 0:
-        print(f"Flushed {num_rx_total} samples from RX streamer")
+    buffer_size = rx_data.shape[1]
+    staging = np.empty((rx_data.shape[0], RX_CHUNK_WORDS), dtype=rx_data.dtype)
+    num_rx = 0
+    num_truncated = 0
+    while True:
+        # Only stop on a timeout which started after done was set, data which is still
+        # in flight when the generation stops is received as well
+        finished = done.is_set()
+        remaining = rx_data[:, num_rx:]
+        if num_rx < buffer_size and remaining.flags.c_contiguous:
+            num_rx_chunk = rx_streamer.recv(remaining, rx_md, 0.1)
+            num_rx += num_rx_chunk
+        else:
+            num_rx_chunk = rx_streamer.recv(staging, rx_md, 0.1)
+            num_stored = min(num_rx_chunk, buffer_size - num_rx)
+            np.copyto(rx_data[:, num_rx : num_rx + num_stored], staging[:, :num_stored])
+            num_rx += num_stored
+            num_truncated += num_rx_chunk - num_stored
+        if num_rx_chunk == 0 and finished:
+            break
+    return num_rx, num_truncated
 
 
 def generate_data_and_stream_to_host(
     null_blocks, rx_streamer, rx_data, duration, rx_md=uhd.types.RXMetadata()
 ):
-    """Generate data on the FPGA using the Null block and stream the data to the host."""
+    """Generate data on the FPGA using the Null block and stream the data to the host.
+
+    Returns the part of rx_data which was filled with received data and the number of
+    samples per channel which were received but didn't fit into rx_data.
+    """
+    rx_streamer_flush(rx_streamer)
+    done = threading.Event()
     rx_thread = ThreadWithReturnValue(
-        target=rx_streamer.recv, args=(rx_data, rx_md, duration + 0.1)
+        target=receive_chunks, args=(rx_streamer, rx_data, rx_md, done)
     )
     rx_thread.start()
-    rx_streamer_flush(rx_streamer)
     generate_data(null_blocks, duration)
-    num_rx = rx_thread.join()
+    done.set()
+    num_rx, num_truncated = rx_thread.join()
     rx_streamer_flush(rx_streamer)
-    return num_rx
+    return rx_data[:, :num_rx], num_truncated
 
 
-def connect_blocks(graph, connections, is_back_edge=False):
+def connect_blocks(graph, chains, is_back_edge=False):
     """Connect RFNoC Blocks.
 
+    The edges of all chains are passed to the graph in a single call.
+
     Args:
         graph: the RFNoC graph
-        connections: array of tuples (block, port) where the connection is established
-            from the first to the second entry, then from the second to the third
-            and so on
+        chains: list of connection chains. Every chain is an array of tuples (block, port)
+            where the connection is established from the first to the second entry, then
+            from the second to the third and so on
         is_back_edge: Set this flag to true if the graph is a circular graph
     """
-    src = connections[:-1]  # elements 0..N-1
-    dst = connections[1:]  # elements 1..N
-    for (src_blk, src_port), (dst_blk, dst_port) in zip(src, dst):
-        graph.connect(src_blk, src_port, dst_blk, dst_port, is_back_edge)
+    edges = []
+    for connections in chains:
+        src = connections[:-1]  # elements 0..N-1
+        dst = connections[1:]  # elements 1..N
+        for (src_blk, src_port), (dst_blk, dst_port) in zip(src, dst):
+            edges.append((src_blk, src_port, dst_blk, dst_port, is_back_edge))
+    connect_many(graph, edges)
+
+
+def get_null_counts(null_block, port_type=SOURCE):
+    """Read the packet and line counters of the NullSrcSink block port."""
+    return null_block.get_count(port_type, PACKETS), null_block.get_count(port_type, LINES)
 
 
-def print_null_statistics(null_block, port_type=SOURCE, header_append=""):
-    """Print the statistics (packets, lines) of the NullSrcSink block."""
-    num_lines = null_block.get_count(port_type, LINES)
-    num_packets = null_block.get_count(port_type, PACKETS)
+def format_null_statistics(num_packets, num_lines, port_type=SOURCE, header_append=""):
+    """Format the statistics (packets, lines) of a NullSrcSink block as a list of lines."""
     port_type = "source" if port_type == SOURCE else "sink"
     header = f"Null {port_type} statistics" + header_append
-    print("\n" + header + "\n" + "=" * len(header))
-    print(f"# of packets received    : {num_packets}")
-    print(f"# of lines received      : {num_lines}")
+    return [
+        "\n" + header,
+        "=" * len(header),
+        f"# of packets received    : {num_packets}",
+        f"# of lines received      : {num_lines}",
+    ]
 
 
 def main():
     """The main function."""
     # 1. Parse the command line arguments
     args = parse_args()
-    graph = uhd.rfnoc.RfnocGraph(args.args)
+    graph = uhd.rfnoc.RfnocGraph(add_default_transport_args(args.args))
 
-    null_block_src = []
     null_block_sink = []
 
     connections = [[] for x in range(args.num_chans)]
@@ -220,12 +286,11 @@ def main():
             " bitfiles for the X400 series do not include NullSrcSink blocks. You need to compile a custom bitfile with those blocks"
             " included."
         )
+    # ... remember that these Null blocks are used as source
+    null_block_src = configure_null_blocks(
+        graph, null_blocks[: args.num_chans], args.bytes_per_packet, args.throttle_cycles
+    )
     for idx in range(args.num_chans):
-        # ... remember that this Null block is used as source
-        null_block_src.append(uhd.rfnoc.NullBlockControl(graph.get_block(null_blocks[idx])))
-        # ... configure the Null block
-        null_block_src[idx].set_bytes_per_packet(args.bytes_per_packet)
-        null_block_src[idx].set_throttle_cycles(args.throttle_cycles)
         # ... add connection
         connections[idx].append((null_block_src[idx].get_unique_id(), 0))
 
@@ -272,21 +337,20 @@ def main():
     else:
         # Use NullSrcSink Block on FPGA as data sink
         null_blocks = graph.find_blocks("NullSrcSink")
+        # ... remember that these Null blocks are used as sink
+        null_block_sink = configure_null_blocks(
+            graph, null_blocks[: args.num_chans], args.bytes_per_packet, args.throttle_cycles
+        )
         for idx, chan in enumerate(args.aurora_channels):
-            # ... remember that this Null block is used as sink
-            null_block_sink.append(uhd.rfnoc.NullBlockControl(graph.get_block(null_blocks[idx])))
-            # ... configure the Null block
-            null_block_sink[idx].set_bytes_per_packet(args.bytes_per_packet)
-            null_block_sink[idx].set_throttle_cycles(args.throttle_cycles)
             # ... add connection
             connections[idx].append((null_block_sink[idx].get_unique_id(), 0))
         is_back_edge = True
         rx_streamer = None
 
     # 5. Connect the blocks
-    for idx, connection in enumerate(connections):
-        print(f"connecting blocks for channel {args.aurora_channels[idx]}")
-        connect_blocks(graph, connection, is_back_edge)
+    for chan in args.aurora_channels:
+        print(f"connecting blocks for channel {chan}")
+    connect_blocks(graph, connections, is_back_edge)
     graph.commit()
 
     # 6. Write a graphical representation of the graph if the argument "graph" was provided
@@ -304,41 +368,53 @@ def main():
 
     # 8. Actually stream the data
     if rx_streamer is not None:
-        rx_buffer_size = 10000000
-        rx_data = np.zeros((args.num_chans, rx_buffer_size), dtype=np.uint32)
-        num_rx = generate_data_and_stream_to_host(
+        # Size the buffer for the data the sources can generate within the duration (plus 10%
+        # slack), data exceeding MAX_RX_BUFFER_WORDS is received but not kept
+        line_rate = NULL_SRC_CLOCK_RATE_HZ / (args.throttle_cycles + 1)
+        expected_words = int(args.duration * line_rate * WORDS_PER_LINE * 1.1)
+        rx_buffer_size = max(1, min(MAX_RX_BUFFER_WORDS, expected_words))
+        # The streamer fills the buffer in place, the unfilled tail is sliced off
+        rx_data = aligned_empty((args.num_chans, rx_buffer_size), dtype=np.uint32)
+        rx_data, num_truncated = generate_data_and_stream_to_host(
             null_block_src, rx_streamer, rx_data, args.duration
         )
-        print(f"Received {num_rx} samples over RX streamer")
-        rx_data = rx_data[:, 0:num_rx]
+        print(f"Received {rx_data.shape[1] + num_truncated} samples over RX streamer")
     else:
         generate_data(null_block_src, args.duration)
 
     # 9. Evaluate the results
+    # ... the report is collected in output and written at once when the evaluation is done
+    output = []
     errors = []
 
+    # Each counter is read once, every read is a control transaction
+    null_src_counts = [get_null_counts(null_block, SOURCE) for null_block in null_block_src]
     null_src_packets = 0
     null_src_lines = 0
-    for chan, null_block in zip(args.aurora_channels, null_block_src):
-        print_null_statistics(null_block, SOURCE, f" (channel {chan})")
-        if null_block.get_count(SOURCE, PACKETS) == 0:
+    for chan, null_block, (packets, lines) in zip(
+        args.aurora_channels, null_block_src, null_src_counts
+    ):
+        output += format_null_statistics(packets, lines, SOURCE, f" (channel {chan})")
+        if packets == 0:
             errors.append(
                 f"Null data source for channel {chan} ({null_block.get_unique_id()}) did not generate any data"
             )
-        null_src_packets += null_block.get_count(SOURCE, PACKETS)
-        null_src_lines += null_block.get_count(SOURCE, LINES)
+        null_src_packets += packets
+        null_src_lines += lines
 
     if aurora_block is not None:
         aurora_tx_counter = aurora_block.get_aurora_tx_packet_counter()
         aurora_rx_counter = aurora_block.get_aurora_rx_packet_counter()
         aurora_overflow_counter = aurora_block.get_aurora_overflow_counter()
         aurora_crc_errors = aurora_block.get_aurora_crc_error_counter()
-        print("\nAurora statistics")
-        print("=================")
-        print(f"# of packets transmitted : {aurora_tx_counter}")
-        print(f"# of packets received    : {aurora_rx_counter}")
-        print(f"# of overflows           : {aurora_overflow_counter}")
-        print(f"# of CRC errors          : {aurora_crc_errors}")
+        output += [
+            "\nAurora statistics",
+            "=================",
+            f"# of packets transmitted : {aurora_tx_counter}",
+            f"# of packets received    : {aurora_rx_counter}",
+            f"# of overflows           : {aurora_overflow_counter}",
+            f"# of CRC errors          : {aurora_crc_errors}",
+        ]
         if aurora_tx_counter < null_src_packets:
             errors.append(
                 f"{null_src_packets - aurora_tx_counter} packets got lost from Null Source block(s) to Aurora block"
@@ -354,10 +430,9 @@ def main():
 
     if rx_streamer is not None:
 
-        def _print_data(rx_data):
-            """Print the received data."""
-            for dat in rx_data:
-                print(f"0x{dat:08x}")
+        def _format_data(rx_data):
+            """Format the received data as a list of lines."""
+            return [f"0x{dat:08x}" for dat in rx_data.tolist()]
 
         def _verify_data(rx_data):
             """Verify the data. The data from the null source block contains counter values.
@@ -375,45 +450,52 @@ def main():
             [5] 0x0002FFFD
             (...)
             """
-            null_ref = iter(NullSrcSinkReferenceData(words_per_line=2))
-            for dat in rx_data:
-                reference = next(null_ref)
-                if dat != reference:
+            for start in range(0, len(rx_data), VERIFY_CHUNK_WORDS):
+                chunk = rx_data[start : start + VERIFY_CHUNK_WORDS]
+                reference = NullSrcSinkReferenceData.generate(len(chunk), WORDS_PER_LINE, start)
+                mismatches = np.flatnonzero(chunk != reference)
+                if len(mismatches) > 0:
+                    idx = mismatches[0]
                     return (
                         False,
-                        f"mismatch in line {null_ref.line:02d} expected: 0x{reference:08x}, received: 0x{dat:08x}",
+                        f"mismatch in line {(start + idx) // WORDS_PER_LINE:02d} expected: 0x{reference[idx]:08x}, received: 0x{chunk[idx]:08x}",
                     )
             return True, ""
 
         rx_data = rx_data[0]
-        rx_lines = len(rx_data) // 2
-        print("\nReceived data on the host")
-        print("=========================")
-        print(f"# of U32 words received  : {len(rx_data)}")
-        print(f"# of lines received      : {rx_lines}")
+        # The words which didn't fit into the buffer were received, they are only not verified
+        rx_words = len(rx_data) + num_truncated
+        rx_lines = rx_words // WORDS_PER_LINE
+        output += [
+            "\nReceived data on the host",
+            "=========================",
+            f"# of U32 words received  : {rx_words}",
+            f"# of lines received      : {rx_lines}",
+        ]
+        if num_truncated > 0:
+            output.append(f"# of U32 words verified  : {len(rx_data)} (RX buffer full)")
         lines_reference = aurora_rx_counter if aurora_block else null_src_lines
-        if num_rx == rx_buffer_size:
-            pass
-        elif rx_lines < lines_reference:
+        if rx_lines < lines_reference:
             errors.append(f"{lines_reference - rx_lines} lines got lost when streaming to the host")
-        print("\nReceived data:")
-        _print_data(rx_data[:4])
-        print("...")
-        _print_data(rx_data[-4:])
-        print("\nValidating received data for continuously increasing counter value...", end="")
+        output.append("\nReceived data:")
+        output += _format_data(rx_data[:4])
+        output.append("...")
+        output += _format_data(rx_data[-4:])
         data_ok, message = _verify_data(rx_data)
-        if data_ok:
-            print("OK")
-        else:
-            print("MISMATCH")
+        output.append(
+            "\nValidating received data for continuously increasing counter value..."
+            + ("OK" if data_ok else "MISMATCH")
+        )
+        if not data_ok:
             errors.append(message)
     else:
-        for chan, null_src, null_sink in zip(args.aurora_channels, null_block_src, null_block_sink):
-            print_null_statistics(null_sink, SINK, f" (channel {chan})")
-            missing_packets = null_src.get_count(SOURCE, PACKETS) - null_sink.get_count(
-                SINK, PACKETS
-            )
-            missing_lines = null_src.get_count(SOURCE, LINES) - null_sink.get_count(SINK, LINES)
+        for chan, (src_packets, src_lines), null_sink in zip(
+            args.aurora_channels, null_src_counts, null_block_sink
+        ):
+            sink_packets, sink_lines = get_null_counts(null_sink, SINK)
+            output += format_null_statistics(sink_packets, sink_lines, SINK, f" (channel {chan})")
+            missing_packets = src_packets - sink_packets
+            missing_lines = src_lines - sink_lines
             if missing_packets != 0:
                 errors.append(
                     f"channel {chan}: {missing_packets} packets got lost from source to sink"
@@ -422,13 +504,14 @@ def main():
                 errors.append(f"channel {chan}: {missing_lines} lines got lost from source to sink")
 
     if len(errors) > 0:
-        print("")
-        for error in errors:
-            print(f"ERROR: {error}")
+        output.append("")
+        output += [f"ERROR: {error}" for error in errors]
+    else:
+        output.append("\nPASS")
+    sys.stdout.write("\n".join(output) + "\n")
+    if len(errors) > 0:
         sys.exit(1)
 
-    print("\nPASS")
-
 
 if __name__ == "__main__":
     global logger
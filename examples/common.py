@@ -9,7 +9,6 @@
 import logging
 import os.path
 import subprocess
-import tempfile
 from threading import Thread
 
 import numpy as np
@@ -23,18 +22,56 @@ class ThreadWithReturnValue(Thread):
         """Initialize an object of this class."""
         Thread.__init__(self, group, target, name, args, kwargs)
         self._returncode = None
+        self._exception = None
 
     def run(self):
-        """Run the target function in a thread."""
-        if self._target is not None:
-            self._returncode = self._target(*self._args, **self._kwargs)
+        """Run the target function in a thread, keeping its return value or exception."""
+        try:
+            if self._target is not None:
+                self._returncode = self._target(*self._args, **self._kwargs)
+        except Exception as exception:
+            self._exception = exception
 
     def join(self, *args):
-        """Wait until the thread terminates. Returns the returncode of the executed function."""
+        """Wait until the thread terminates. Returns the returncode of the executed function.
+
+        An exception raised by the executed function is re-raised in the joining thread.
+        """
         Thread.join(self, *args)
+        if self._exception is not None:
+            raise self._exception
         return self._returncode
 
 
+def aligned_empty(shape, dtype, align=4096):
+    """Allocate an uninitialized, C-contiguous numpy array aligned to align bytes.
+
+    The array is a view into a slightly larger byte buffer whose start is moved to the
+    next align-byte boundary (default: page size). Streamers and file I/O can then
+    operate on whole pages of the array.
+    """
+    dtype = np.dtype(dtype)
+    num_bytes = int(np.prod(shape)) * dtype.itemsize
+    raw = np.empty(num_bytes + align, dtype=np.uint8)
+    offset = -raw.ctypes.data % align
+    return raw[offset : offset + num_bytes].view(dtype).reshape(shape)
+
+
+# Socket buffer sizes requested from the UHD transport unless set in the device args. The
+# default Linux limits (~200 kB) drop packets during bursts. The kernel caps the buffers at
+# net.core.rmem_max / net.core.wmem_max, raise those as well, e.g.:
+#   sudo sysctl -w net.core.rmem_max=33554432 net.core.wmem_max=33554432
+DEFAULT_TRANSPORT_ARGS = {"recv_buff_size": 33554432, "send_buff_size": 33554432}
+
+
+def add_default_transport_args(device_args: str) -> str:
+    """Append DEFAULT_TRANSPORT_ARGS to the device args for all keys which aren't set."""
+    keys = {arg.split("=", 1)[0].strip() for arg in device_args.split(",")}
+    args = [device_args] if device_args else []
+    args += [f"{key}={value}" for key, value in DEFAULT_TRANSPORT_ARGS.items() if key not in keys]
+    return ",".join(args)
+
+
 def write_graph(graph, filename: str, logger: logging.Logger):
     """Write a RFNoC graph to a .dot file (or other image formats if graphviz is installed)."""
     _, ext = os.path.splitext(filename)
@@ -42,18 +79,19 @@ def write_graph(graph, filename: str, logger: logging.Logger):
         with open(filename, "w") as f:
             f.write(graph.to_dot())
     else:
-        with tempfile.NamedTemporaryFile("w") as f:
-            f.write(graph.to_dot())
-            f.seek(0)
-            try:
-                proc = subprocess.run(
-                    ["dot", "-T", ext[1:], "-o", filename, f.name], capture_output=True
+        # Feed the graph to dot through its stdin rather than through a temporary file
+        try:
+            proc = subprocess.run(
+                ["dot", "-T", ext[1:], "-o", filename],
+                input=graph.to_dot().encode(),
+                capture_output=True,
+            )
+            if (proc.returncode != 0) and logger is not None:
+                logger.warning(
+                    f'WARNING: Could not write graph to file {filename}, executable "dot" returned return code {proc.returncode} - {proc.stderr.decode()}'
                 )
-                if (proc.returncode != 0) and logger is not None:
-                    logger.warning(
-                        f'WARNING: Could not write graph to file {filename}, executable "dot" returned return code {proc.returncode} - {proc.stderr.decode()}'
-                    )
-            except FileNotFoundError:
+        except FileNotFoundError:
+            if logger is not None:
                 logger.warning(
                     f'WARNING: Could not write graph to file {filename}, executable "dot" was not found'
                 )
@@ -62,61 +100,55 @@ def write_graph(graph, filename: str, logger: logging.Logger):
 class NullSrcSinkReferenceData:
     """This class provides the reference data of a NullSrcSink RFNoC block."""
 
+    __slots__ = ("mask", "iteration", "line", "hi", "lo")
+
     def __init__(self, words_per_line):
         """Initialize an object of this class."""
         self.mask = words_per_line - 1
 
-    def __iter__(self):
-        """Initialize the iterator."""
-        self.iteration = 0
-        self.line = 0
-        self.hi = np.uint32(0x00000000)
-        self.lo = np.uint32(0x0000FFFF)
-        return self
-
-    def __next__(self):
-        """Iterator: Generate and return the value of the next line."""
-        retval = self.hi | self.lo
-        if (self.iteration & self.mask) == self.mask:  # line change -> increase the counter value
-            self.line += 1
-            # upper 16 bits: counter increasing from 0x0000
-            self.hi += 0x00010000
-            self.hi &= 0xFFFF0000
-            # lower 16 bits: counter decreasing from 0xFFFF
-            self.lo -= 0x00000001
-            self.lo &= 0x0000FFFF
-        self.iteration += 1
-        return retval
+    @classmethod
+    def generate(cls, num_words, words_per_line=2, offset=0):
+        """Generate num_words words of the reference data, starting at word offset.
 
-
-class Counter:
-    """This class provides the reference data of a NullSrcSink RFNoC block."""
-
-    def __init__(self, dtype):
-        """Initialize an object of this class."""
-        self.mask = words_per_line - 1
+        This is the vectorized equivalent of iterating over an object of this class.
+        """
+        line = np.arange(offset, offset + num_words, dtype=np.uint32) // np.uint32(words_per_line)
+        # upper 16 bits: counter increasing from 0x0000
+        hi = (line << np.uint32(16)) & np.uint32(0xFFFF0000)
+        # lower 16 bits: counter decreasing from 0xFFFF
+        lo = (np.uint32(0xFFFF) - line) & np.uint32(0x0000FFFF)
+        return hi | lo
 
     def __iter__(self):
         """Initialize the iterator."""
         self.iteration = 0
         self.line = 0
-        self.hi = np.uint32(0x00000000)
-        self.lo = np.uint32(0x0000FFFF)
+        self.hi = 0x00000000
+        self.lo = 0x0000FFFF
         return self
 
     def __next__(self):
         """Iterator: Generate and return the value of the next line."""
-        retval = self.hi | self.lo
-        if (self.iteration & self.mask) == self.mask:  # line change -> increase the counter value
+        hi = self.hi
+        lo = self.lo
+        mask = self.mask
+        iteration = self.iteration
+        if (iteration & mask) == mask:  # line change -> increase the counter value
             self.line += 1
             # upper 16 bits: counter increasing from 0x0000
-            self.hi += 0x00010000
-            self.hi &= 0xFFFF0000
+            self.hi = (hi + 0x00010000) & 0xFFFF0000
             # lower 16 bits: counter decreasing from 0xFFFF
-            self.lo -= 0x00000001
-            self.lo &= 0x0000FFFF
-        self.iteration += 1
-        return retval
+            self.lo = (lo - 0x00000001) & 0x0000FFFF
+        self.iteration = iteration + 1
+        return hi | lo
+
+
+# Scratch buffers of rx_streamer_flush, keyed by (id(rx_streamer), number of channels). The
+# flushed data is discarded, so the buffers are allocated uninitialized once and reused.
+_FLUSH_BUF = {}
+# Number of samples per channel received by each .recv call of rx_streamer_flush. Large
+# enough to amortize the call overhead, the flush loop runs until the streamer is empty.
+FLUSH_BUF_SAMPLES = 65536
 
 
 def rx_streamer_flush(rx_streamer):
@@ -125,7 +157,11 @@ def rx_streamer_flush(rx_streamer):
     Repeatedly call .recv until no data is received within the given timeout.
     """
     rx_md = uhd.types.RXMetadata()
-    rx_data = np.zeros((rx_streamer.get_num_channels(), 10000000), dtype=np.uint32)
+    num_chans = rx_streamer.get_num_channels()
+    key = (id(rx_streamer), num_chans)
+    rx_data = _FLUSH_BUF.get(key)
+    if rx_data is None:
+        rx_data = _FLUSH_BUF[key] = np.empty((num_chans, FLUSH_BUF_SAMPLES), dtype=np.uint32)
     num_rx_total = 0
     num_rx = None
     while num_rx != 0:
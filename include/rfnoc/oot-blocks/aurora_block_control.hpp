@@ -211,6 +211,19 @@ public:
      */
     virtual std::vector<bool> get_lane_status() = 0;
 
+    /*! Wait until the Aurora link is up
+     *
+     * Blocks until the core reports link up or the timeout expires. The link
+     * status is polled in intervals starting at 10 ms and backing off to 100 ms,
+     * so a link which comes up quickly is detected shortly after it occurs. The
+     * link status is polled a last time once the timeout has expired.
+     *
+     * \param timeout Maximum time to wait (in seconds)
+     *
+     * \returns true if the link is up, false if the timeout expired
+     */
+    virtual bool wait_for_link_up(const double timeout = 3.0) = 0;
+
     /*! Gets the Aurora native flow control (NFC) parameter pause count.
      *
      * This is the pause count to provide to the NFC interface when flow
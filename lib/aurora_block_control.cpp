@@ -13,7 +13,10 @@
 #include <uhd/transport/bounded_buffer.hpp>
 #include <uhd/utils/compat_check.hpp>
 #include <boost/format.hpp>
+#include <algorithm>
+#include <chrono>
 #include <numeric>
+#include <thread>
 
 using namespace rfnoc::oot_blocks;
 using namespace uhd::rfnoc;
@@ -23,6 +26,12 @@ namespace {
 constexpr uint16_t MAJOR_COMPAT = 1;
 constexpr uint16_t MINOR_COMPAT = 0;
 
+//! Initial and maximum interval in which wait_for_link_up() polls the link status. The
+//  interval is doubled after every poll, so a link which comes up quickly is detected
+//  quickly without increasing the control traffic of long waits.
+constexpr auto LINK_POLL_INTERVAL_MIN = std::chrono::milliseconds(10);
+constexpr auto LINK_POLL_INTERVAL_MAX = std::chrono::milliseconds(100);
+
 } // namespace
 
 const uint32_t aurora_block_control::REG_COMPAT_ADDR             = 0x0;
@@ -172,6 +181,24 @@ public:
         return retval;
     }
 
+    bool wait_for_link_up(const double timeout = 3.0) override
+    {
+        const auto deadline = std::chrono::steady_clock::now()
+                              + std::chrono::duration_cast<std::chrono::steady_clock::duration>(
+                                  std::chrono::duration<double>(timeout));
+        std::chrono::steady_clock::duration interval = LINK_POLL_INTERVAL_MIN;
+        while (!get_link_status()) {
+            const auto now = std::chrono::steady_clock::now();
+            if (now >= deadline) {
+                return false;
+            }
+            std::this_thread::sleep_for(std::min(interval, deadline - now));
+            interval = std::min<std::chrono::steady_clock::duration>(
+                2 * interval, LINK_POLL_INTERVAL_MAX);
+        }
+        return true;
+    }
+
     uint8_t get_fc_pause_count() override
     {
         return (regs().peek32(REG_CORE_FC_PAUSE_ADDR) >> REG_PAUSE_COUNT_POS)
@@ -31,6 +31,10 @@ void export_aurora_block_control(py::module& m)
             py::overload_cast<size_t>(&aurora_block_control::get_lane_status))
         .def("get_lane_status",
             py::overload_cast<>(&aurora_block_control::get_lane_status))
+        .def("wait_for_link_up",
+            &aurora_block_control::wait_for_link_up,
+            py::arg("timeout") = 3.0,
+            py::call_guard<py::gil_scoped_release>())
         .def("get_fc_pause_count", &aurora_block_control::get_fc_pause_count)
         .def("set_fc_pause_count", &aurora_block_control::set_fc_pause_count)
         .def("get_fc_pause_threshold", &aurora_block_control::get_fc_pause_threshold)
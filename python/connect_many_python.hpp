@@ -0,0 +1,96 @@
+//
+// Copyright 2025 Ettus Research, a National Instruments Brand
+//
+// SPDX-License-Identifier: GPL-3.0-or-later
+//
+
+#pragma once
+
+#include <uhd/exception.hpp>
+#include <uhd/rfnoc_graph.hpp>
+#include <uhd/stream.hpp>
+#include <string>
+#include <vector>
+
+//! One edge of a connect_many() call, converted from its Python representation
+struct graph_edge
+{
+    std::string src_blk;
+    size_t src_port;
+    uhd::tx_streamer::sptr tx_streamer;
+    std::string dst_blk;
+    size_t dst_port;
+    uhd::rx_streamer::sptr rx_streamer;
+    bool is_back_edge;
+};
+
+/*! Connect all edges of a list in one call
+ *
+ * Every edge is a tuple (src, src_port, dst, dst_port[, is_back_edge]). The source
+ * is either a block ID or a TX streamer, the destination either a block ID or an RX
+ * streamer. All edges are converted before any connection is made, the connections
+ * themselves are made without holding the GIL.
+ */
+void connect_many(uhd::rfnoc::rfnoc_graph::sptr graph, const py::iterable& edges)
+{
+    std::vector<graph_edge> graph_edges;
+    for (const auto& item : edges) {
+        const auto edge = item.cast<py::tuple>();
+        if (edge.size() != 4 && edge.size() != 5) {
+            throw uhd::value_error(
+                "connect_many(): edges must be tuples (src, src_port, dst, dst_port[, "
+                "is_back_edge])");
+        }
+        const py::object src = edge[0];
+        const py::object dst = edge[2];
+        graph_edge converted;
+        if (py::isinstance<uhd::tx_streamer>(src)) {
+            converted.tx_streamer = src.cast<uhd::tx_streamer::sptr>();
+        } else {
+            converted.src_blk = src.cast<std::string>();
+        }
+        converted.src_port = edge[1].cast<size_t>();
+        if (py::isinstance<uhd::rx_streamer>(dst)) {
+            converted.rx_streamer = dst.cast<uhd::rx_streamer::sptr>();
+        } else {
+            converted.dst_blk = dst.cast<std::string>();
+        }
+        converted.dst_port     = edge[3].cast<size_t>();
+        converted.is_back_edge = edge.size() == 5 && edge[4].cast<bool>();
+        if (converted.tx_streamer && converted.rx_streamer) {
+            throw uhd::value_error(
+                "connect_many(): cannot connect a TX streamer to an RX streamer");
+        }
+        graph_edges.push_back(converted);
+    }
+
+    py::gil_scoped_release release;
+    for (const auto& edge : graph_edges) {
+        if (edge.tx_streamer) {
+            graph->connect(edge.tx_streamer,
+                edge.src_port,
+                uhd::rfnoc::block_id_t(edge.dst_blk),
+                edge.dst_port);
+        } else if (edge.rx_streamer) {
+            graph->connect(uhd::rfnoc::block_id_t(edge.src_blk),
+                edge.src_port,
+                edge.rx_streamer,
+                edge.dst_port);
+        } else {
+            graph->connect(uhd::rfnoc::block_id_t(edge.src_blk),
+                edge.src_port,
+                uhd::rfnoc::block_id_t(edge.dst_blk),
+                edge.dst_port,
+                edge.is_back_edge);
+        }
+    }
+}
+
+void export_connect_many(py::module& m)
+{
+    m.def("connect_many",
+        &connect_many,
+        py::arg("graph"),
+        py::arg("edges"),
+        "Connect a list of (src, src_port, dst, dst_port[, is_back_edge]) edges");
+}
@@ -26,6 +26,7 @@ void* init_numpy()
     return NULL;
 }
 #include "aurora_block_control_python.hpp"
+#include "connect_many_python.hpp"
 
 PYBIND11_MODULE(rfnoc_oot_blocks_python, m)
 {
@@ -35,4 +36,5 @@ PYBIND11_MODULE(rfnoc_oot_blocks_python, m)
 
     // uhd::rfnoc::python::export_noc_block_base(m);
         export_aurora_block_control(m);
+        export_connect_many(m);
 }
@@ -17,3 +17,6 @@ AuroraBlockControl = lib.aurora_block_control
 
 # Expose types
 channel_stop_policy = lib.channel_stop_policy
+
+# Expose functions
+connect_many = lib.connect_many
@@ -288,6 +288,20 @@ BOOST_FIXTURE_TEST_CASE(aurora_test_get_status, aurora_block_fixture)
     }
 }
 
+/*
+ * This test case ensures that waiting for the link returns as soon as the link
+ * is up and times out otherwise.
+ */
+BOOST_FIXTURE_TEST_CASE(aurora_test_wait_for_link_up, aurora_block_fixture)
+{
+    UHD_LOG_INFO("TEST", "wait_for_link_up() with link_status=false");
+    reg_iface->set_ro_register(aurora_block_control::REG_CORE_STATUS_ADDR, 0);
+    BOOST_CHECK(!test_aurora->wait_for_link_up(0.05));
+    UHD_LOG_INFO("TEST", "wait_for_link_up() with link_status=true");
+    reg_iface->set_ro_register(aurora_block_control::REG_CORE_STATUS_ADDR, 1 << 4);
+    BOOST_CHECK(test_aurora->wait_for_link_up(0.05));
+}
+
 /*
  * This test case ensures that the flow control parameters pause count,
  * pause threshold and resume threshold have the expected default values
@@ -1,9 +1,17 @@
+import os
 import uhd
 import numpy as np
 usrp = uhd.usrp.MultiUSRP("addr=10.157.161.243")
-samples = 0.1*np.random.randn(10000) + 0.1j*np.random.randn(10000) # create random signal
+samples_cache = "/tmp/tx_x440_samples.npy" # the random signal is reused across runs
+if os.path.exists(samples_cache):
+    samples = np.load(samples_cache, mmap_mode="r")
+else:
+    rng = np.random.default_rng(0)
+    samples = rng.standard_normal(2 * 10000, dtype=np.float32).view(np.complex64) # create random signal
+    samples *= 0.1
+    np.save(samples_cache, samples)
 duration = 10 # seconds
 center_freq = 1e9
 sample_rate = 368.64e6
 gain = 0 # [dB] start low then work your way up
-usrp.send_waveform(samples, duration, center_freq, sample_rate, [0], gain)
\ No newline at end of file
+usrp.send_waveform(samples, duration, center_freq, sample_rate, [0], gain)